@@ -0,0 +1,175 @@
+import re
+import sys
+import json
+import time
+from pathlib import Path
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+# Share the uploader's validation rules so neighbours only point at rows it will accept
+sys.path.append(str(Path(__file__).resolve().parent.parent / "upload_to_supabase"))
+from validation import validate_place
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+# Run after enrich_places.py and before upload_to_supabase.py. Neighbours are only
+# drawn from the places in INPUT_PATH: rows already in the database but missing from
+# the file are neither candidates nor refreshed, so build from a file that holds every
+# place of each city (e.g. the cumulative output of resumed enrichment runs).
+INPUT_PATH = Path("data/places/enriched_places_perplexity.json")
+TOP_K = 5
+BLOCK_SIZE = 512  # Rows per similarity block; bounds the dense block to BLOCK_SIZE x city size
+TAG_WEIGHT = 0.4  # Share of the cosine score coming from category/subcategory/mood_tags
+MIN_TOKEN_LENGTH = 3
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "her", "was",
+    "one", "our", "out", "has", "his", "how", "its", "who", "did", "yes", "she", "him",
+    "this", "that", "with", "from", "they", "their", "there", "which", "while", "where",
+    "what", "when", "also", "into", "than", "then", "them", "these", "those", "have",
+    "been", "were", "will", "more", "most", "such", "only", "over", "very", "just",
+    "about", "after", "before", "other", "some", "each", "many", "much", "visitors",
+    "visitor", "place", "city",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and short tokens removed."""
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+def place_tags(place: Dict[str, Any]) -> List[str]:
+    """Namespaced tag features so a category and a mood tag with the same name don't collide."""
+    tags = []
+    if place.get("category"):
+        tags.append(f"category:{place['category'].lower()}")
+    if place.get("subcategory"):
+        tags.append(f"subcategory:{place['subcategory'].lower()}")
+    tags.extend(f"mood:{tag.lower()}" for tag in place.get("mood_tags") or [])
+    return tags
+
+def count_matrix(documents: List[List[str]]) -> sp.csr_matrix:
+    """Sparse document x term count matrix."""
+    vocabulary: Dict[str, int] = {}
+    indptr = [0]
+    indices: List[int] = []
+    for document in documents:
+        for term in document:
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    matrix = sp.csr_matrix(
+        (data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(documents), len(vocabulary)),
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+def l2_normalize(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.diags(1.0 / norms).dot(matrix).tocsr()
+
+def tfidf_matrix(documents: List[List[str]]) -> sp.csr_matrix:
+    """Sublinear TF-IDF with smoothed IDF, rows L2-normalized."""
+    counts = count_matrix(documents)
+    n_docs = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+    counts.data = 1.0 + np.log(counts.data)
+    return l2_normalize(counts.dot(sp.diags(idf.astype(np.float32))).tocsr())
+
+def build_feature_matrix(places: List[Dict[str, Any]]) -> sp.csr_matrix:
+    """Concatenate text and tag vectors weighted so the row dot product blends both cosines."""
+    text = tfidf_matrix([tokenize(place.get("description") or "") for place in places])
+    tags = l2_normalize(count_matrix([place_tags(place) for place in places]))
+    combined = sp.hstack([np.sqrt(1 - TAG_WEIGHT) * text, np.sqrt(TAG_WEIGHT) * tags]).tocsr()
+    return l2_normalize(combined)
+
+def top_k_neighbours(matrix: sp.csr_matrix, k: int) -> List[List[Tuple[int, float]]]:
+    """Top-k cosine neighbours for every row, computed in row blocks."""
+    n_rows = matrix.shape[0]
+    k = min(k, n_rows - 1)
+    if k <= 0:
+        return [[] for _ in range(n_rows)]
+
+    transposed = matrix.T.tocsc()
+    neighbours = []
+    for start in range(0, n_rows, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, n_rows)
+        scores = matrix[start:stop].dot(transposed).toarray()
+        # A place is never its own neighbour
+        scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+
+        for row_candidates, row_scores in zip(candidates, candidate_scores):
+            neighbours.append([
+                (int(index), float(score))
+                for index, score in zip(row_candidates, row_scores)
+                if score > 0
+            ])
+    return neighbours
+
+def main():
+    start_time = time.time()
+    places = json.loads(INPUT_PATH.read_text(encoding="utf-8"))
+    print(f"✅ Loaded {len(places)} places from {INPUT_PATH}")
+
+    # Neighbours are only meaningful within a city, need a place_id to reference,
+    # and must be rows the uploader accepts. Duplicate place_ids are indexed once
+    # (the last copy wins) so a place can never list its own copy as a neighbour.
+    places_by_city: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+    copies: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+    invalid: List[Dict[str, Any]] = []
+    for place in places:
+        place.pop("similar_places", None)
+        if not place.get("place_id"):
+            continue
+        if validate_place(place):
+            invalid.append(place)
+            continue
+        places_by_city[place["city"]][place["place_id"]] = place
+        copies[(place["city"], place["place_id"])].append(place)
+
+    # An explicit null lets the uploader clear a stale list on the existing row,
+    # unless another copy of the same place_id is valid and carries the real list
+    valid_ids = {place_id for _, place_id in copies}
+    for place in invalid:
+        if place["place_id"] not in valid_ids:
+            place["similar_places"] = None
+
+    linked = 0
+    for city, unique_places in places_by_city.items():
+        city_places = list(unique_places.values())
+        matrix = build_feature_matrix(city_places)
+        for place, neighbours in zip(city_places, top_k_neighbours(matrix, TOP_K)):
+            similar = [
+                {"place_id": city_places[index]["place_id"], "score": round(score, 4)}
+                for index, score in neighbours
+                if city_places[index]["place_id"] != place["place_id"]
+            ]
+            for copy in copies[(city, place["place_id"])]:
+                copy["similar_places"] = similar
+            linked += bool(similar)
+        print(f"  - {city}: {len(city_places)} places indexed")
+
+    INPUT_PATH.write_text(json.dumps(places, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print("\n📊 Similarity Summary:")
+    print(f"Cities indexed: {len(places_by_city)}")
+    print(f"Unique places with neighbours: {linked}/{sum(len(unique) for unique in places_by_city.values())}")
+    print(f"Places left out (failed validation): {len(invalid)}")
+    print(f"Total time: {time.time() - start_time:.2f} seconds")
+    print(f"\n✅ Done! Saved neighbour lists to {INPUT_PATH}")
+
+if __name__ == "__main__":
+    main()
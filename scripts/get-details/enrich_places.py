@@ -4,15 +4,17 @@ import time
 from pathlib import Path
 import re
 import os
-from typing import Dict, Any
+import math
+from typing import Dict, Any, List, Optional, Tuple
 
 # Configuration
-PERPLEXITY_API_KEY = "XXXXX'
+PERPLEXITY_API_KEY = "XXXXX"
 PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
 
 # Pricing information (per 1M tokens)
 PRICING = {
-    "sonar-pro": {"input": 0.5, "output": 1.5},  # $0.5/M input tokens, $1.5/M output tokens
+    "sonar-pro": {"input": 3.0, "output": 15.0},  # $3/M input tokens, $15/M output tokens
+    "sonar": {"input": 1.0, "output": 1.0},
     "pplx-7b-online": {"input": 0.2, "output": 0.8},
     "pplx-70b-online": {"input": 1.0, "output": 2.0},
     "mixtral-8x7b-instruct": {"input": 0.6, "output": 1.8},
@@ -24,6 +26,26 @@ PRICING = {
 WORKSPACE_ROOT = Path(__file__).parent.parent
 INPUT_FILE = WORKSPACE_ROOT / "data" / "places" / "enriched_top_200_places.json"
 OUTPUT_FILE = WORKSPACE_ROOT / "data" / "places" / "enriched_places_perplexity.json"
+# Places left over when a run stops at its budget; picked up by the next run
+QUEUE_FILE = WORKSPACE_ROOT / "data" / "places" / "enrichment_queue.json"
+# Places that kept failing across runs; set aside for a manual look instead of retried forever
+PARKED_FILE = WORKSPACE_ROOT / "data" / "places" / "enrichment_parked.json"
+
+# Budget configuration
+BUDGET_USD = float(os.environ["ENRICH_BUDGET_USD"]) if os.getenv("ENRICH_BUDGET_USD") else None
+PRIMARY_MODEL = "sonar-pro"
+FALLBACK_MODEL = "sonar"
+DOWNGRADE_AT = 0.8  # Switch to FALLBACK_MODEL once this share of the budget is spent
+# Token guesses used until real requests have been observed
+DEFAULT_INPUT_TOKENS = 450
+DEFAULT_OUTPUT_TOKENS = 400
+# Every attempt that gets a response is billed, so the budget reserves room for all of them
+MAX_ATTEMPTS = 3
+# Stop the run (keeping the queue) when this many places in a row fail, e.g. during an outage
+MAX_CONSECUTIVE_FAILURES = 5
+# Failed enrichments per place, counted across runs in ATTEMPTS_KEY, before it is parked
+MAX_PLACE_ATTEMPTS = 3
+ATTEMPTS_KEY = "_enrich_attempts"
 
 class TokenTracker:
     def __init__(self):
@@ -66,9 +88,91 @@ class TokenTracker:
             print(f"  Output Cost: ${req['output_cost']:.4f}")
             print(f"  Total Cost: ${req['total_cost']:.4f}")
 
+    def estimate_cost(self, model: str) -> float:
+        """Estimate the cost of one request to `model` from the observed token averages."""
+        if self.requests:
+            avg_input = self.total_input_tokens / len(self.requests)
+            avg_output = self.total_output_tokens / len(self.requests)
+        else:
+            avg_input, avg_output = DEFAULT_INPUT_TOKENS, DEFAULT_OUTPUT_TOKENS
+        return (avg_input / 1_000_000) * PRICING[model]["input"] + (avg_output / 1_000_000) * PRICING[model]["output"]
+
 # Initialize token tracker
 token_tracker = TokenTracker()
 
+class EnrichmentScheduler:
+    """Orders places by popularity and picks a model that keeps the run within budget."""
+
+    def __init__(self, tracker: TokenTracker, budget: Optional[float]):
+        self.tracker = tracker
+        self.budget = budget
+
+    @staticmethod
+    def priority(place: Dict[str, Any]) -> float:
+        """Popular, well-rated places first: rating weighted by log review count."""
+        rating = place.get("rating") or 0
+        ratings_total = place.get("user_ratings_total") or 0
+        return rating * math.log1p(ratings_total)
+
+    def build_queue(self, places_by_city: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Untried places first, then retries, each group most popular first."""
+        queue = [(city, place) for city, places in places_by_city.items() for place in places]
+        queue.sort(key=lambda item: (item[1].get(ATTEMPTS_KEY, 0), -self.priority(item[1])))
+        return queue
+
+    def next_model(self) -> Optional[str]:
+        """Model to use for the next place, or None once the budget is exhausted.
+
+        Reserves MAX_ATTEMPTS requests per place since retries after a parse failure are billed too.
+        """
+        if self.budget is None:
+            return PRIMARY_MODEL
+        spent = self.tracker.total_cost
+        if spent + MAX_ATTEMPTS * self.tracker.estimate_cost(PRIMARY_MODEL) <= self.budget * DOWNGRADE_AT:
+            return PRIMARY_MODEL
+        if spent + MAX_ATTEMPTS * self.tracker.estimate_cost(FALLBACK_MODEL) <= self.budget:
+            return FALLBACK_MODEL
+        return None
+
+def group_by_city(queue: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for city, place in queue:
+        grouped.setdefault(city, []).append(place)
+    return grouped
+
+def write_queue(queue: List[Tuple[str, Dict[str, Any]]]):
+    """Save unprocessed places in the input file layout so the next run can resume."""
+    if not queue:
+        if QUEUE_FILE.exists():
+            QUEUE_FILE.unlink()
+        return
+    with open(QUEUE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(group_by_city(queue), f, ensure_ascii=False, indent=2)
+    print(f"Saved {len(queue)} remaining places to {QUEUE_FILE}")
+
+def write_parked(parked: List[Tuple[str, Dict[str, Any]]], resuming: bool):
+    """Add places that ran out of attempts to PARKED_FILE; a fresh run starts a new file."""
+    parked_by_city: Dict[str, List[Dict[str, Any]]] = {}
+    if resuming and PARKED_FILE.exists():
+        with open(PARKED_FILE, 'r', encoding='utf-8') as f:
+            parked_by_city = json.load(f)
+    elif PARKED_FILE.exists():
+        PARKED_FILE.unlink()
+    if not parked:
+        return
+    for city, places in group_by_city(parked).items():
+        parked_by_city.setdefault(city, []).extend(places)
+    with open(PARKED_FILE, 'w', encoding='utf-8') as f:
+        json.dump(parked_by_city, f, ensure_ascii=False, indent=2)
+    print(f"Parked {len(parked)} places after {MAX_PLACE_ATTEMPTS} failed attempts in {PARKED_FILE}")
+
+def merge_enriched(existing: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Combine enriched places keyed by place_id, newer entries replacing older ones."""
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for place in existing + new:
+        merged[place.get("place_id") or (place.get("name"), place.get("city"))] = place
+    return list(merged.values())
+
 def extract_json_from_content(content):
     """Extract JSON from content that might be wrapped in code blocks."""
     # Try to find JSON content between ```json and ``` markers
@@ -84,7 +188,7 @@ def extract_json_from_content(content):
     # If no markers found, return the content as is
     return content
 
-def get_perplexity_response(place_name, city):
+def get_perplexity_response(place_name, city, model=PRIMARY_MODEL):
     """Get enrichment data from Perplexity API for a given place."""
     prompt = f"""You are a travel expert helping generate structured data for a travel planning app.
 I will give you the name of a point of interest (POI) and the city it's in.
@@ -122,7 +226,7 @@ City: {city}"""
     }
 
     data = {
-        "model": "sonar-pro",
+        "model": model,
         "messages": [
             {
                 "role": "system",
@@ -135,7 +239,7 @@ City: {city}"""
         ]
     }
 
-    for attempt in range(3):  # Try up to 3 times
+    for attempt in range(MAX_ATTEMPTS):
         try:
             response = requests.post(PERPLEXITY_API_URL, headers=headers, json=data)
             print(f"API Response Status: {response.status_code}")
@@ -183,64 +287,102 @@ City: {city}"""
     
     return None
 
-def enrich_place(place):
+def enrich_place(place, model=PRIMARY_MODEL):
     """Enrich a single place with Perplexity data."""
-    print(f"Enriching {place['name']} in {place['city']}...")
+    print(f"Enriching {place['name']} in {place['city']} with {model}...")
     
     # Get enrichment data from Perplexity
-    enrichment_data = get_perplexity_response(place['name'], place['city'])
+    enrichment_data = get_perplexity_response(place['name'], place['city'], model)
     
     if enrichment_data:
         # Merge the original place data with the new enrichment data
         enriched_place = {**place, **enrichment_data}
+        enriched_place.pop(ATTEMPTS_KEY, None)
         return enriched_place
     return None
 
 def main():
+    # Resume from the leftover queue of a previous budget-capped run if there is one
+    resuming = QUEUE_FILE.exists()
+    input_file = QUEUE_FILE if resuming else INPUT_FILE
+
     # Print current working directory and file paths for debugging
     print(f"Current working directory: {os.getcwd()}")
-    print(f"Input file path: {INPUT_FILE}")
-    print(f"Input file exists: {INPUT_FILE.exists()}")
-    print(f"Input file absolute path: {INPUT_FILE.absolute()}")
+    print(f"Input file path: {input_file}")
+    print(f"Input file exists: {input_file.exists()}")
+    print(f"Input file absolute path: {input_file.absolute()}")
+    print(f"Budget: {f'${BUDGET_USD:.2f}' if BUDGET_USD is not None else 'unlimited'}")
     
     # Read the input file
     try:
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            print(f"Reading file: {INPUT_FILE}")
+        with open(input_file, 'r', encoding='utf-8') as f:
+            print(f"Reading file: {input_file}")
             places_by_city = json.load(f)
             print(f"Successfully loaded JSON with {len(places_by_city)} cities")
             
-            # Initialize list to store enriched places
+            # Keep places enriched by earlier runs when picking up a queue; a fresh
+            # run replaces OUTPUT_FILE so a later resume never merges unrelated data
+            previous_places = []
+            if resuming and OUTPUT_FILE.exists():
+                with open(OUTPUT_FILE, 'r', encoding='utf-8') as out:
+                    previous_places = json.load(out)
+                print(f"Resuming with {len(previous_places)} previously enriched places")
             enriched_places = []
-            total_places = sum(len(places) for places in places_by_city.values())
+            
+            # Most popular places first so a capped run covers what matters
+            scheduler = EnrichmentScheduler(token_tracker, BUDGET_USD)
+            queue = scheduler.build_queue(places_by_city)
+            total_places = len(queue)
             processed_places = 0
             
-            # Process each city and its places
-            for city, places in places_by_city.items():
-                print(f"\nProcessing city: {city}")
-                print(f"Number of places in {city}: {len(places)}")
+            failed = []
+            parked = []
+            consecutive_failures = 0
+            
+            while queue:
+                model = scheduler.next_model()
+                if model is None:
+                    print(f"\nBudget reached after ${token_tracker.total_cost:.4f}; stopping with {len(queue)} places left")
+                    break
+                if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                    print(f"\n{consecutive_failures} places failed in a row; stopping with {len(queue)} places left")
+                    break
                 
-                for place in places:
-                    processed_places += 1
-                    print(f"\nProcessing place {processed_places}/{total_places}: {place['name']} in {city}")
-                    enriched_place = enrich_place(place)
-                    
-                    if enriched_place:
-                        enriched_places.append(enriched_place)
-                        print(f"Successfully enriched {place['name']}")
+                city, place = queue.pop(0)
+                processed_places += 1
+                print(f"\nProcessing place {processed_places}/{total_places}: {place['name']} in {city}")
+                enriched_place = enrich_place(place, model)
+                
+                if enriched_place:
+                    enriched_places.append(enriched_place)
+                    consecutive_failures = 0
+                    print(f"Successfully enriched {place['name']}")
+                else:
+                    # Keep it for the next run, behind untried places, until it runs out of attempts
+                    place[ATTEMPTS_KEY] = place.get(ATTEMPTS_KEY, 0) + 1
+                    if place[ATTEMPTS_KEY] >= MAX_PLACE_ATTEMPTS:
+                        parked.append((city, place))
                     else:
-                        print(f"Failed to enrich {place['name']}")
-                    
-                    # Add a small delay between API calls to avoid rate limits
-                    time.sleep(1)
+                        failed.append((city, place))
+                    consecutive_failures += 1
+                    print(f"Failed to enrich {place['name']} (attempt {place[ATTEMPTS_KEY]}/{MAX_PLACE_ATTEMPTS})")
+                
+                # Add a small delay between API calls to avoid rate limits
+                time.sleep(1)
+            
+            if failed:
+                print(f"{len(failed)} failed places will be retried on the next run")
+            write_queue(queue + failed)
+            write_parked(parked, resuming)
             
-            # Write the enriched places to the output file
+            # Always write the output alongside the queue so the two stay in step
+            all_enriched = merge_enriched(previous_places, enriched_places)
+            with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+                json.dump(all_enriched, f, ensure_ascii=False, indent=2)
             if enriched_places:
-                with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(enriched_places, f, ensure_ascii=False, indent=2)
-                print(f"\nSuccessfully saved {len(enriched_places)} enriched places to {OUTPUT_FILE}")
+                print(f"\nSuccessfully saved {len(all_enriched)} enriched places to {OUTPUT_FILE}")
             else:
-                print("\nNo places were successfully enriched")
+                print(f"\nNo places were successfully enriched; saved {len(all_enriched)} places to {OUTPUT_FILE}")
                 
     except Exception as e:
         print(f"Error processing file: {e}")
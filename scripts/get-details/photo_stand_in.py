@@ -0,0 +1,61 @@
+import io
+import os
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+# Local stand-in for the Places photo endpoint so resolve_photos.py can be run
+# without an API key or quota:
+#
+#   python scripts/get-details/photo_stand_in.py
+#   PHOTO_API_URL=http://127.0.0.1:8765/photo python scripts/get-details/resolve_photos.py
+#
+# Each reference gets a deterministic solid-colour JPEG, so reruns hit the cache
+# and duplicate references share one stored image. References starting with
+# "html-" get an HTML page with a 200 status, mimicking an error page that the
+# resolver must reject without caching anything.
+HOST = os.getenv("PHOTO_STAND_IN_HOST", "127.0.0.1")
+PORT = int(os.getenv("PHOTO_STAND_IN_PORT", "8765"))
+IMAGE_SIZE = (800, 600)
+
+def render_photo(reference: str) -> bytes:
+    """Solid-colour JPEG whose colour is derived from the reference."""
+    digest = hashlib.sha256(reference.encode("utf-8")).digest()
+    buffer = io.BytesIO()
+    Image.new("RGB", IMAGE_SIZE, tuple(digest[:3])).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+class PhotoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        reference = parse_qs(urlparse(self.path).query).get("photo_reference", [None])[0]
+        if not reference:
+            self.send_error(400, "Missing photo_reference")
+            return
+
+        if reference.startswith("html-"):
+            body, content_type = b"<html><body>Something went wrong</body></html>", "text/html"
+        else:
+            body, content_type = render_photo(reference), "image/jpeg"
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    server = ThreadingHTTPServer((HOST, PORT), PhotoHandler)
+    print(f"📷 Photo stand-in listening on http://{HOST}:{PORT}/photo")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import io
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Set, Optional
+
+import requests
+from PIL import Image, ImageOps
+from tqdm import tqdm
+
+# ─── CONFIG ────────────────────────────────────────────────────────────────────
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "XXXXX")
+# Point this at the local stand-in (photo_stand_in.py, http://127.0.0.1:8765/photo)
+# to test without spending Places quota.
+PHOTO_API_URL = os.getenv("PHOTO_API_URL", "https://maps.googleapis.com/maps/api/place/photo")
+# Base URL the cache directory is served from once it has been synced.
+PHOTO_PUBLIC_BASE_URL = os.getenv("PHOTO_PUBLIC_BASE_URL", "/photos").rstrip("/")
+INPUT_PATH = Path("data/places/enriched_places_perplexity.json")
+CACHE_DIR = Path("data/photo_cache")
+CACHE_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+MAX_PHOTOS_PER_PLACE = 3
+MAX_WIDTH = 1600
+THUMBNAIL_SIZE = (400, 300)
+THUMBNAIL_QUALITY = 85
+MAX_WORKERS = 8
+MAX_QPS = 10
+MAX_RETRIES = 3
+RETRY_DELAY = 1  # seconds
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+class RateLimiter:
+    """Spaces out calls so no more than `qps` start per second across all threads."""
+
+    def __init__(self, qps: float):
+        self.interval = 1.0 / qps
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            slot = max(time.monotonic(), self.next_slot)
+            self.next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+class PhotoCache:
+    """Content-addressed photo store with fixed-size thumbnails and size-based eviction.
+
+    Originals live at `originals/<sha[:2]>/<sha><ext>` and thumbnails at
+    `thumbs/<sha[:2]>/<sha>.jpg`, so identical images fetched through different
+    references are stored once. `index.json` maps photo references to keys so
+    reruns skip references that have already been resolved.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = root / "index.json"
+        self.lock = threading.Lock()
+        self.index: Dict[str, str] = {}
+        if self.index_path.exists():
+            self.index = json.loads(self.index_path.read_text(encoding="utf-8"))
+
+    def original_path(self, key: str) -> Path:
+        return self.root / "originals" / key[:2] / key
+
+    def thumbnail_path(self, key: str) -> Path:
+        sha = key.split(".", 1)[0]
+        return self.root / "thumbs" / sha[:2] / f"{sha}.jpg"
+
+    def get(self, reference: str) -> Optional[str]:
+        """Return the cache key for a reference if both files are still on disk."""
+        with self.lock:
+            key = self.index.get(reference)
+        if not key:
+            return None
+        original, thumbnail = self.original_path(key), self.thumbnail_path(key)
+        if not (original.exists() and thumbnail.exists()):
+            return None
+        # Bump mtime so eviction treats the entry as recently used
+        os.utime(original)
+        os.utime(thumbnail)
+        return key
+
+    def put(self, reference: str, content: bytes, content_type: str) -> str:
+        """Store image bytes under their SHA-256 and render the thumbnail."""
+        sha = hashlib.sha256(content).hexdigest()
+        ext = CONTENT_TYPE_EXTENSIONS.get(content_type.split(";")[0].strip().lower(), ".jpg")
+        key = f"{sha}{ext}"
+
+        original, thumbnail = self.original_path(key), self.thumbnail_path(key)
+        if not (original.exists() and thumbnail.exists()):
+            # Decode before touching the disk so non-image bodies (e.g. HTML error
+            # pages served with a 200) never leave orphaned files in the cache
+            with Image.open(io.BytesIO(content)) as image:
+                thumb = ImageOps.fit(image.convert("RGB"), THUMBNAIL_SIZE, Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumb.save(buffer, format="JPEG", quality=THUMBNAIL_QUALITY)
+            if not original.exists():
+                _write_atomic(original, content)
+            _write_atomic(thumbnail, buffer.getvalue())
+
+        with self.lock:
+            self.index[reference] = key
+        return key
+
+    def evict(self, pinned: Set[str]) -> int:
+        """Delete least recently used unreferenced entries until the cache fits in max_bytes.
+
+        Every key in the index has had its URLs written onto a place row that may
+        already be published, so indexed keys are never evicted, nor are keys in
+        `pinned`. Leftover temp files from interrupted writes are removed. Returns
+        the number of entries removed.
+        """
+        with self.lock:
+            referenced = set(self.index.values()) | pinned
+
+        entries = []
+        total = 0
+        for tmp_file in self.root.glob("*/*/*.tmp"):
+            tmp_file.unlink(missing_ok=True)
+        originals_dir = self.root / "originals"
+        if originals_dir.exists():
+            for original in originals_dir.glob("*/*"):
+                if original.suffix == ".tmp":
+                    continue
+                key = original.name
+                thumbnail = self.thumbnail_path(key)
+                size = original.stat().st_size
+                if thumbnail.exists():
+                    size += thumbnail.stat().st_size
+                total += size
+                entries.append((original.stat().st_mtime, key, size))
+
+        removed = 0
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key in referenced:
+                continue
+            self.original_path(key).unlink(missing_ok=True)
+            self.thumbnail_path(key).unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        if total > self.max_bytes:
+            print(f"⚠️ Cache holds {total / 1024 / 1024:.1f} MB of referenced photos, above the "
+                  f"{self.max_bytes / 1024 / 1024:.0f} MB cap; raise CACHE_MAX_BYTES")
+        return removed
+
+    def save_index(self):
+        with self.lock:
+            _write_atomic(self.index_path, json.dumps(self.index, indent=2).encode("utf-8"))
+
+def _write_atomic(path: Path, data: bytes):
+    """Write to a temp file and rename so readers never see partial files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+def fetch_photo(reference: str, limiter: RateLimiter) -> Optional[requests.Response]:
+    """Download the image for a photo reference with retries."""
+    params = {
+        "maxwidth": MAX_WIDTH,
+        "photo_reference": reference,
+        "key": GOOGLE_API_KEY,
+    }
+    for attempt in range(MAX_RETRIES):
+        limiter.wait()
+        try:
+            response = requests.get(PHOTO_API_URL, params=params, timeout=15)
+            if response.status_code == 429 or response.status_code >= 500:
+                time.sleep(RETRY_DELAY * (2 ** attempt))
+                continue
+            if response.status_code != 200:
+                print(f"    - Error: status {response.status_code} for photo {reference[:20]}…")
+                return None
+            return response
+        except requests.exceptions.RequestException as e:
+            print(f"    - Error: photo request failed for {reference[:20]}…: {e}")
+            time.sleep(RETRY_DELAY * (2 ** attempt))
+    return None
+
+def resolve_reference(reference: str, cache: PhotoCache, limiter: RateLimiter) -> Optional[str]:
+    """Return the cache key for a reference, fetching it if it is not cached yet."""
+    key = cache.get(reference)
+    if key:
+        return key
+    response = fetch_photo(reference, limiter)
+    if response is None:
+        return None
+    try:
+        return cache.put(reference, response.content, response.headers.get("Content-Type", ""))
+    except (OSError, Image.DecompressionBombError) as e:
+        print(f"    - Error: could not store photo {reference[:20]}…: {e}")
+        return None
+
+def photo_urls(key: str) -> Dict[str, str]:
+    """Stable public URLs for a cache key."""
+    sha = key.split(".", 1)[0]
+    return {
+        "cache_key": key,
+        "url": f"{PHOTO_PUBLIC_BASE_URL}/originals/{key[:2]}/{key}",
+        "thumbnail_url": f"{PHOTO_PUBLIC_BASE_URL}/thumbs/{sha[:2]}/{sha}.jpg",
+    }
+
+def collect_references(places: List[Dict[str, Any]]) -> Set[str]:
+    """Unique photo references across all places, capped per place."""
+    references = set()
+    for place in places:
+        for photo in (place.get("photos") or [])[:MAX_PHOTOS_PER_PLACE]:
+            if photo.get("reference"):
+                references.add(photo["reference"])
+    return references
+
+def main():
+    start_time = time.time()
+    places = json.loads(INPUT_PATH.read_text(encoding="utf-8"))
+    references = collect_references(places)
+    print(f"✅ Found {len(references)} unique photo references in {len(places)} places")
+
+    cache = PhotoCache(CACHE_DIR, CACHE_MAX_BYTES)
+    limiter = RateLimiter(MAX_QPS)
+    resolved: Dict[str, str] = {}
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(resolve_reference, ref, cache, limiter): ref for ref in references}
+        with tqdm(total=len(futures), desc="Resolving photos") as pbar:
+            for future in as_completed(futures):
+                key = future.result()
+                if key:
+                    resolved[futures[future]] = key
+                pbar.update(1)
+
+    # Write the stable keys/URLs back onto each place's photos
+    for place in places:
+        for photo in place.get("photos") or []:
+            key = resolved.get(photo.get("reference"))
+            if key:
+                photo.update(photo_urls(key))
+
+    evicted = cache.evict(pinned=set(resolved.values()))
+    cache.save_index()
+    _write_atomic(INPUT_PATH, json.dumps(places, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    print("\n📊 Photo Summary:")
+    print(f"References resolved: {len(resolved)}/{len(references)}")
+    print(f"Unique images stored: {len(set(resolved.values()))}")
+    print(f"Entries evicted: {evicted}")
+    print(f"Total time: {time.time() - start_time:.2f} seconds")
+    print(f"\n✅ Done! Updated photo URLs in {INPUT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -8,78 +8,24 @@ from datetime import datetime
 import psutil
 from tqdm import tqdm
 from supabase import create_client, Client
+from validation import validate_place
 
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://eojfvcrnuvzzwayvfzvq.supabase.co")
+# Use the service-role key: refresh_city_catalog(), set_similar_places() and
+# set_place_photos() can't be called by anon/authenticated. Inserts update the catalog via a trigger.
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "XXXXX")
 INPUT_PATH = Path("data/places/enriched_places_perplexity.json")
 BATCH_SIZE = 50
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
-
-# Field validation rules
-FIELD_RULES = {
-    "name": {"required": True, "max_length": 255},
-    "city": {"required": True, "max_length": 100},
-    "description": {"required": True, "max_length": 2000},
-    "category": {"required": True, "max_length": 50},
-    "subcategory": {"max_length": 50},
-    "mood_tags": {"required": True, "type": list},
-    "suggested_visit_time": {"max_length": 50},
-    "duration": {"max_length": 50},
-    "local_tip": {"max_length": 500},
-    "popularity_score": {"type": float, "min": 0, "max": 1},
-    "price_level": {"max_length": 10},
-    "rating": {"type": float, "min": 0, "max": 5},
-    "user_ratings_total": {"type": int, "min": 0},
-}
+# Set to "1" to rebuild city_catalog from scratch after uploading (repairs drift
+# from rows deleted or edited outside this script)
+REBUILD_CITY_CATALOG = os.getenv("REBUILD_CITY_CATALOG") == "1"
 
 # ─── INITIALIZE SUPABASE CLIENT ───────────────────────────────────────────────
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-class ValidationError(Exception):
-    """Custom exception for validation errors."""
-    pass
-
-def validate_field(field_name: str, value: Any) -> Optional[str]:
-    """Validate a field against its rules."""
-    rules = FIELD_RULES.get(field_name, {})
-    
-    if rules.get("required") and value is None:
-        return f"{field_name} is required"
-    
-    if value is None:
-        return None
-    
-    if "max_length" in rules and isinstance(value, str):
-        if len(value) > rules["max_length"]:
-            return f"{field_name} exceeds maximum length of {rules['max_length']}"
-    
-    if "type" in rules:
-        expected_type = rules["type"]
-        if not isinstance(value, expected_type):
-            return f"{field_name} must be of type {expected_type.__name__}"
-    
-    if "min" in rules and isinstance(value, (int, float)):
-        if value < rules["min"]:
-            return f"{field_name} must be at least {rules['min']}"
-    
-    if "max" in rules and isinstance(value, (int, float)):
-        if value > rules["max"]:
-            return f"{field_name} must be at most {rules['max']}"
-    
-    return None
-
-def validate_place(place: Dict[str, Any]) -> List[str]:
-    """Validate all fields of a place."""
-    errors = []
-    for field_name, rules in FIELD_RULES.items():
-        value = place.get(field_name)
-        error = validate_field(field_name, value)
-        if error:
-            errors.append(error)
-    return errors
-
 def load_input(path: Path) -> List[Dict[str, Any]]:
     """Load places from a JSON array or NDJSON file with memory monitoring."""
     start_memory = psutil.Process().memory_info().rss / 1024 / 1024  # MB
@@ -167,6 +113,7 @@ def prepare_row(place: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         "fetched_at": place.get("fetched_at"),
         "enrichment_status": place.get("enrichment_status", "completed"),
         "photos": place.get("photos"),
+        "similar_places": place.get("similar_places"),
         "raw_ai_json": place,
         "last_updated": datetime.utcnow().isoformat(),
     }
@@ -196,6 +143,38 @@ def insert_batch(batch: List[Dict[str, Any]], batch_num: int, total_batches: int
             return False
     return False
 
+def update_existing_rows(function: str, updates: List[Dict[str, Any]], batch_num: int, total_batches: int) -> bool:
+    """Send a batch of per-place_id updates to an update RPC with retry logic."""
+    for attempt in range(MAX_RETRIES):
+        try:
+            supabase.rpc(function, {"updates": updates}).execute()
+            return True
+        except Exception as e:
+            print(f"❌ Exception in {function} batch {batch_num}/{total_batches} (attempt {attempt + 1}/{MAX_RETRIES}): {str(e)}", file=sys.stderr)
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(RETRY_DELAY * (attempt + 1))
+                continue
+            return False
+    return False
+
+def rebuild_city_catalog() -> bool:
+    """Recompute city_catalog from the whole places table with retry logic.
+
+    Inserts keep the catalog current through a database trigger; this is only
+    needed to repair it.
+    """
+    for attempt in range(MAX_RETRIES):
+        try:
+            supabase.rpc("refresh_city_catalog", {}).execute()
+            return True
+        except Exception as e:
+            print(f"❌ Exception rebuilding city catalog (attempt {attempt + 1}/{MAX_RETRIES}): {str(e)}", file=sys.stderr)
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(RETRY_DELAY * (attempt + 1))
+                continue
+            return False
+    return False
+
 def main():
     """Main function to orchestrate the upload process."""
     start_time = time.time()
@@ -204,11 +183,27 @@ def main():
     print(f"✅ Found {len(existing_ids)} already in the database")
 
     valid_places = []
+    similar_updates = []
+    photo_updates = []
     skipped = 0
 
     with tqdm(total=len(places), desc="Validating places") as pbar:
         for place in places:
             if place.get("place_id") in existing_ids:
+                # Refresh neighbour lists on existing rows; a null clears the list of a row
+                # that no longer passes validation. Only rows present in the input file
+                # are refreshed (see build_similar_places.py).
+                if "similar_places" in place:
+                    similar_updates.append({
+                        "place_id": place["place_id"],
+                        "similar_places": place["similar_places"],
+                    })
+                # Cached photo URLs are resolved after the first upload, so push them too
+                if any(photo.get("cache_key") for photo in place.get("photos") or []):
+                    photo_updates.append({
+                        "place_id": place["place_id"],
+                        "photos": place["photos"],
+                    })
                 skipped += 1
                 pbar.update(1)
                 continue
@@ -232,6 +227,19 @@ def main():
                 successful_batches += 1
             pbar.update(1)
 
+    update_results = {}
+    for function, updates in (("set_similar_places", similar_updates), ("set_place_photos", photo_updates)):
+        update_batches = [updates[i:i + BATCH_SIZE] for i in range(0, len(updates), BATCH_SIZE)]
+        successful_updates = 0
+        with tqdm(total=len(update_batches), desc=f"Running {function}") as pbar:
+            for i, batch in enumerate(update_batches):
+                if update_existing_rows(function, batch, i + 1, len(update_batches)):
+                    successful_updates += 1
+                pbar.update(1)
+        update_results[function] = (successful_updates, len(update_batches))
+
+    catalog_rebuilt = rebuild_city_catalog() if REBUILD_CITY_CATALOG else None
+
     end_time = time.time()
     total_time = end_time - start_time
     avg_time = total_time / len(places) if places else 0
@@ -242,6 +250,10 @@ def main():
     print(f"Places skipped: {skipped}")
     print(f"Successful batches: {successful_batches}/{len(batches)}")
     print(f"Failed batches: {len(batches) - successful_batches}/{len(batches)}")
+    print(f"Similar places update batches: {update_results['set_similar_places'][0]}/{update_results['set_similar_places'][1]}")
+    print(f"Photo update batches: {update_results['set_place_photos'][0]}/{update_results['set_place_photos'][1]}")
+    if catalog_rebuilt is not None:
+        print(f"City catalog rebuilt: {'yes' if catalog_rebuilt else 'no'}")
     print(f"Total time: {total_time:.2f} seconds")
     print(f"Average time per place: {avg_time:.2f} seconds")
 
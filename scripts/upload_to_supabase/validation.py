@@ -0,0 +1,61 @@
+from typing import List, Dict, Any, Optional
+
+# Field validation rules
+FIELD_RULES = {
+    "name": {"required": True, "max_length": 255},
+    "city": {"required": True, "max_length": 100},
+    "description": {"required": True, "max_length": 2000},
+    "category": {"required": True, "max_length": 50},
+    "subcategory": {"max_length": 50},
+    "mood_tags": {"required": True, "type": list},
+    "suggested_visit_time": {"max_length": 50},
+    "duration": {"max_length": 50},
+    "local_tip": {"max_length": 500},
+    "popularity_score": {"type": float, "min": 0, "max": 1},
+    "price_level": {"max_length": 10},
+    "rating": {"type": float, "min": 0, "max": 5},
+    "user_ratings_total": {"type": int, "min": 0},
+}
+
+class ValidationError(Exception):
+    """Custom exception for validation errors."""
+    pass
+
+def validate_field(field_name: str, value: Any) -> Optional[str]:
+    """Validate a field against its rules."""
+    rules = FIELD_RULES.get(field_name, {})
+    
+    if rules.get("required") and value is None:
+        return f"{field_name} is required"
+    
+    if value is None:
+        return None
+    
+    if "max_length" in rules and isinstance(value, str):
+        if len(value) > rules["max_length"]:
+            return f"{field_name} exceeds maximum length of {rules['max_length']}"
+    
+    if "type" in rules:
+        expected_type = rules["type"]
+        if not isinstance(value, expected_type):
+            return f"{field_name} must be of type {expected_type.__name__}"
+    
+    if "min" in rules and isinstance(value, (int, float)):
+        if value < rules["min"]:
+            return f"{field_name} must be at least {rules['min']}"
+    
+    if "max" in rules and isinstance(value, (int, float)):
+        if value > rules["max"]:
+            return f"{field_name} must be at most {rules['max']}"
+    
+    return None
+
+def validate_place(place: Dict[str, Any]) -> List[str]:
+    """Validate all fields of a place."""
+    errors = []
+    for field_name, rules in FIELD_RULES.items():
+        value = place.get(field_name)
+        error = validate_field(field_name, value)
+        if error:
+            errors.append(error)
+    return errors
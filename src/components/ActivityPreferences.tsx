@@ -18,15 +18,16 @@ export function ActivityPreferences({ city, onComplete }: ActivityPreferencesPro
       try {
         setIsLoading(true);
         const { data, error } = await supabase
-          .from('places')
-          .select('umbrella_category')
+          .from('city_catalog')
+          .select('umbrella_category_counts')
           .eq('city', city)
-          .order('umbrella_category');
+          .maybeSingle();
 
         if (error) throw error;
 
-        const uniqueCategories = Array.from(new Set(data.map(item => item.umbrella_category)))
-          .filter(category => category && !excludedCategories.includes(category))
+        const uniqueCategories = Object.entries(data?.umbrella_category_counts ?? {})
+          .filter(([category, count]) => count > 0 && !excludedCategories.includes(category))
+          .map(([category]) => category)
           .sort();
 
         setCategories(uniqueCategories);
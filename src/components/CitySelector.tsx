@@ -27,8 +27,9 @@ export function CitySelector({ onCitySelect }: CitySelectorProps) {
       } catch {
         // fallback
         const { data: fallbackData, error: fbErr } = await supabase
-          .from('places')
+          .from('city_catalog')
           .select('city')
+          .gt('place_count', 0)
           .order('city');
         if (!fbErr) {
           const uniq = Array.from(new Set(fallbackData.map((i) => i.city)))
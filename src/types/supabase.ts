@@ -84,6 +84,7 @@ export interface Database {
           price_level: string | null;
           city: string;
           popularity_score: number;
+          similar_places: { place_id: string; score: number }[] | null;
         };
         Insert: Partial<Database['public']['Tables']['places']['Row']>;
         Update: Partial<Database['public']['Tables']['places']['Row']>;
@@ -104,6 +105,23 @@ export interface Database {
         Update: Partial<Database['public']['Tables']['saved_trips']['Row']>;
         Relationships: [];
       },
+      city_catalog: {
+        Row: {
+          city: string;
+          place_count: number;
+          category_counts: Record<string, number>;
+          umbrella_category_counts: Record<string, number>;
+          mood_tag_counts: Record<string, number>;
+          min_lat: number | null;
+          max_lat: number | null;
+          min_lng: number | null;
+          max_lng: number | null;
+          updated_at: string;
+        };
+        Insert: Partial<Database['public']['Tables']['city_catalog']['Row']>;
+        Update: Partial<Database['public']['Tables']['city_catalog']['Row']>;
+        Relationships: [];
+      },
     }
     Views: {
       [_ in never]: never
@@ -0,0 +1,135 @@
+/*
+  # Add city_catalog table
+
+  1. New Tables
+    - `city_catalog`: One row per city, maintained by the uploader
+      - `city` (text, primary key)
+      - `place_count` (integer)
+      - `category_counts` (jsonb, category -> count)
+      - `mood_tag_counts` (jsonb, mood tag -> count)
+      - `min_lat`, `max_lat`, `min_lng`, `max_lng` (double precision, bounding box)
+      - `updated_at` (timestamptz)
+
+  2. New Functions
+    - `merge_count_histograms`: Adds two jsonb count maps key by key
+    - `apply_city_catalog_delta`: Merges per-city deltas from a batch of inserted places
+
+  3. Changes
+    - Backfill `city_catalog` from the existing `places` rows
+    - `get_distinct_cities` reads from `city_catalog` instead of scanning `places`
+
+  4. Security
+    - Enable RLS
+    - Allow everyone to read the catalog
+*/
+
+CREATE TABLE IF NOT EXISTS city_catalog (
+  city text PRIMARY KEY,
+  place_count integer NOT NULL DEFAULT 0,
+  category_counts jsonb NOT NULL DEFAULT '{}'::jsonb,
+  mood_tag_counts jsonb NOT NULL DEFAULT '{}'::jsonb,
+  min_lat double precision,
+  max_lat double precision,
+  min_lng double precision,
+  max_lng double precision,
+  updated_at timestamptz DEFAULT now() NOT NULL
+);
+
+ALTER TABLE city_catalog ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Anyone can view the city catalog"
+  ON city_catalog
+  FOR SELECT
+  TO anon, authenticated
+  USING (true);
+
+CREATE OR REPLACE FUNCTION merge_count_histograms(a jsonb, b jsonb)
+RETURNS jsonb AS $$
+  SELECT COALESCE(jsonb_object_agg(key, total), '{}'::jsonb)
+  FROM (
+    SELECT key, SUM(value::integer) AS total
+    FROM (
+      SELECT * FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+      UNION ALL
+      SELECT * FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+    ) counts
+    GROUP BY key
+  ) merged;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION apply_city_catalog_delta(deltas jsonb)
+RETURNS void AS $$
+BEGIN
+  INSERT INTO city_catalog AS c (
+    city, place_count, category_counts, mood_tag_counts,
+    min_lat, max_lat, min_lng, max_lng, updated_at
+  )
+  SELECT
+    d->>'city',
+    (d->>'place_count')::integer,
+    COALESCE(d->'category_counts', '{}'::jsonb),
+    COALESCE(d->'mood_tag_counts', '{}'::jsonb),
+    (d->>'min_lat')::double precision,
+    (d->>'max_lat')::double precision,
+    (d->>'min_lng')::double precision,
+    (d->>'max_lng')::double precision,
+    now()
+  FROM jsonb_array_elements(deltas) AS d
+  ON CONFLICT (city) DO UPDATE SET
+    place_count = c.place_count + EXCLUDED.place_count,
+    category_counts = merge_count_histograms(c.category_counts, EXCLUDED.category_counts),
+    mood_tag_counts = merge_count_histograms(c.mood_tag_counts, EXCLUDED.mood_tag_counts),
+    min_lat = LEAST(c.min_lat, EXCLUDED.min_lat),
+    max_lat = GREATEST(c.max_lat, EXCLUDED.max_lat),
+    min_lng = LEAST(c.min_lng, EXCLUDED.min_lng),
+    max_lng = GREATEST(c.max_lng, EXCLUDED.max_lng),
+    updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill from the places already uploaded
+INSERT INTO city_catalog (
+  city, place_count, category_counts, mood_tag_counts,
+  min_lat, max_lat, min_lng, max_lng
+)
+SELECT
+  p.city,
+  COUNT(*),
+  COALESCE((
+    SELECT jsonb_object_agg(category, n)
+    FROM (
+      SELECT category, COUNT(*) AS n
+      FROM places
+      WHERE city = p.city AND category IS NOT NULL
+      GROUP BY category
+    ) categories
+  ), '{}'::jsonb),
+  COALESCE((
+    SELECT jsonb_object_agg(tag, n)
+    FROM (
+      SELECT tag, COUNT(*) AS n
+      FROM places, unnest(mood_tags) AS tag
+      WHERE city = p.city
+      GROUP BY tag
+    ) tags
+  ), '{}'::jsonb),
+  MIN(ST_Y(p.coordinates::geometry)),
+  MAX(ST_Y(p.coordinates::geometry)),
+  MIN(ST_X(p.coordinates::geometry)),
+  MAX(ST_X(p.coordinates::geometry))
+FROM places p
+WHERE p.city IS NOT NULL
+GROUP BY p.city
+ON CONFLICT (city) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION get_distinct_cities()
+RETURNS text[] AS $$
+BEGIN
+  RETURN ARRAY(
+    SELECT city
+    FROM city_catalog
+    WHERE place_count > 0
+    ORDER BY city
+  );
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,11 @@
+/*
+  # Add similar_places field to places table
+
+  1. Changes
+    - Add `similar_places` column to `places` table
+      - jsonb array of `{ place_id, score }` objects, nearest first
+      - Built offline by `build_similar_places.py` from descriptions and tags
+*/
+
+ALTER TABLE places
+ADD COLUMN IF NOT EXISTS similar_places jsonb;
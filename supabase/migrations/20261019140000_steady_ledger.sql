@@ -0,0 +1,141 @@
+/*
+  # Keep city_catalog in step with places inside the database
+
+  1. Changes
+    - Add `umbrella_category_counts` column to `city_catalog`, the histogram the
+      activity filter menu needs
+    - `apply_city_catalog_delta` also merges `umbrella_category_counts`
+
+  2. New Functions
+    - `city_catalog_deltas`: Aggregates a batch of places rows into per-city deltas
+    - `refresh_city_catalog`: Rebuilds the whole catalog from `places` (repair path)
+    - `city_catalog_after_places_insert`: Trigger function applying the deltas of
+      each insert statement, so the catalog commits or rolls back with the rows
+
+  3. New Triggers
+    - `city_catalog_places_insert` on `places` (AFTER INSERT, per statement)
+
+  4. Security
+    - Catalog writes run as SECURITY DEFINER from the trigger
+    - `apply_city_catalog_delta` and `refresh_city_catalog` are not callable by
+      `anon` or `authenticated`; only the service role may run them
+*/
+
+ALTER TABLE city_catalog
+ADD COLUMN IF NOT EXISTS umbrella_category_counts jsonb NOT NULL DEFAULT '{}'::jsonb;
+
+CREATE OR REPLACE FUNCTION apply_city_catalog_delta(deltas jsonb)
+RETURNS void AS $$
+BEGIN
+  INSERT INTO city_catalog AS c (
+    city, place_count, category_counts, umbrella_category_counts, mood_tag_counts,
+    min_lat, max_lat, min_lng, max_lng, updated_at
+  )
+  SELECT
+    d->>'city',
+    (d->>'place_count')::integer,
+    COALESCE(d->'category_counts', '{}'::jsonb),
+    COALESCE(d->'umbrella_category_counts', '{}'::jsonb),
+    COALESCE(d->'mood_tag_counts', '{}'::jsonb),
+    (d->>'min_lat')::double precision,
+    (d->>'max_lat')::double precision,
+    (d->>'min_lng')::double precision,
+    (d->>'max_lng')::double precision,
+    now()
+  FROM jsonb_array_elements(deltas) AS d
+  ON CONFLICT (city) DO UPDATE SET
+    place_count = c.place_count + EXCLUDED.place_count,
+    category_counts = merge_count_histograms(c.category_counts, EXCLUDED.category_counts),
+    umbrella_category_counts = merge_count_histograms(c.umbrella_category_counts, EXCLUDED.umbrella_category_counts),
+    mood_tag_counts = merge_count_histograms(c.mood_tag_counts, EXCLUDED.mood_tag_counts),
+    min_lat = LEAST(c.min_lat, EXCLUDED.min_lat),
+    max_lat = GREATEST(c.max_lat, EXCLUDED.max_lat),
+    min_lng = LEAST(c.min_lng, EXCLUDED.min_lng),
+    max_lng = GREATEST(c.max_lng, EXCLUDED.max_lng),
+    updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION city_catalog_deltas(batch places[])
+RETURNS jsonb AS $$
+  WITH rows AS (
+    SELECT * FROM unnest(batch) WHERE city IS NOT NULL
+  )
+  SELECT COALESCE(jsonb_agg(jsonb_build_object(
+    'city', c.city,
+    'place_count', c.place_count,
+    'category_counts', COALESCE((
+      SELECT jsonb_object_agg(category, n)
+      FROM (
+        SELECT category, COUNT(*) AS n
+        FROM rows r
+        WHERE r.city = c.city AND r.category IS NOT NULL
+        GROUP BY category
+      ) categories
+    ), '{}'::jsonb),
+    'umbrella_category_counts', COALESCE((
+      SELECT jsonb_object_agg(umbrella_category, n)
+      FROM (
+        SELECT umbrella_category, COUNT(*) AS n
+        FROM rows r
+        WHERE r.city = c.city AND r.umbrella_category IS NOT NULL
+        GROUP BY umbrella_category
+      ) umbrella_categories
+    ), '{}'::jsonb),
+    'mood_tag_counts', COALESCE((
+      SELECT jsonb_object_agg(tag, n)
+      FROM (
+        SELECT tag, COUNT(*) AS n
+        FROM rows r, unnest(r.mood_tags) AS tag
+        WHERE r.city = c.city
+        GROUP BY tag
+      ) tags
+    ), '{}'::jsonb),
+    'min_lat', c.min_lat,
+    'max_lat', c.max_lat,
+    'min_lng', c.min_lng,
+    'max_lng', c.max_lng
+  )), '[]'::jsonb)
+  FROM (
+    SELECT
+      city,
+      COUNT(*) AS place_count,
+      MIN(ST_Y(coordinates::geometry)) AS min_lat,
+      MAX(ST_Y(coordinates::geometry)) AS max_lat,
+      MIN(ST_X(coordinates::geometry)) AS min_lng,
+      MAX(ST_X(coordinates::geometry)) AS max_lng
+    FROM rows
+    GROUP BY city
+  ) c;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION refresh_city_catalog()
+RETURNS void AS $$
+BEGIN
+  DELETE FROM city_catalog;
+  PERFORM apply_city_catalog_delta(city_catalog_deltas(ARRAY(SELECT p FROM places p)));
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION city_catalog_after_places_insert()
+RETURNS trigger AS $$
+BEGIN
+  PERFORM apply_city_catalog_delta(city_catalog_deltas(ARRAY(SELECT i::places FROM inserted i)));
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS city_catalog_places_insert ON places;
+
+CREATE TRIGGER city_catalog_places_insert
+  AFTER INSERT ON places
+  REFERENCING NEW TABLE AS inserted
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION city_catalog_after_places_insert();
+
+REVOKE EXECUTE ON FUNCTION apply_city_catalog_delta(jsonb) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION refresh_city_catalog() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_city_catalog() TO service_role;
+
+-- Rebuild so existing rows get their umbrella_category counts
+SELECT refresh_city_catalog();
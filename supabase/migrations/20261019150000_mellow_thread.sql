@@ -0,0 +1,29 @@
+/*
+  # Add set_similar_places function
+
+  1. New Functions
+    - `set_similar_places`: Overwrites `similar_places` on existing `places` rows
+      from a jsonb array of `{ place_id, similar_places }` objects, so neighbour
+      lists can be refreshed when a city gains new places
+
+  2. Security
+    - Not callable by `anon` or `authenticated`; only the service role may run it
+*/
+
+CREATE OR REPLACE FUNCTION set_similar_places(updates jsonb)
+RETURNS integer AS $$
+DECLARE
+  updated integer;
+BEGIN
+  UPDATE places p
+  SET similar_places = u->'similar_places'
+  FROM jsonb_array_elements(updates) AS u
+  WHERE p.place_id = u->>'place_id';
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION set_similar_places(jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION set_similar_places(jsonb) TO service_role;
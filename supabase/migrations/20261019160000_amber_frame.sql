@@ -0,0 +1,29 @@
+/*
+  # Add set_place_photos function
+
+  1. New Functions
+    - `set_place_photos`: Overwrites `photos` on existing `places` rows from a
+      jsonb array of `{ place_id, photos }` objects, so rows uploaded before
+      `resolve_photos.py` ran pick up the cached photo URLs
+
+  2. Security
+    - Not callable by `anon` or `authenticated`; only the service role may run it
+*/
+
+CREATE OR REPLACE FUNCTION set_place_photos(updates jsonb)
+RETURNS integer AS $$
+DECLARE
+  updated integer;
+BEGIN
+  UPDATE places p
+  SET photos = u->'photos'
+  FROM jsonb_array_elements(updates) AS u
+  WHERE p.place_id = u->>'place_id';
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION set_place_photos(jsonb) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION set_place_photos(jsonb) TO service_role;
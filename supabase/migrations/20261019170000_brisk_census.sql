@@ -0,0 +1,108 @@
+/*
+  # Keep city_catalog in step with updates and deletes on places
+
+  1. New Functions
+    - `refresh_city_catalog_cities`: Recomputes the catalog rows of the given
+      cities from `places` (a bounding box can't be shrunk from a delta)
+    - `city_catalog_after_places_update`: Trigger function refreshing the cities
+      whose rows changed in a catalogued column (or moved between cities)
+    - `city_catalog_after_places_delete`: Trigger function refreshing the cities
+      of deleted rows
+
+  2. Changes
+    - `refresh_city_catalog` empties the table with `DELETE ... WHERE true`, which
+      pg-safeupdate accepts for PostgREST sessions
+    - Both refresh functions lock `city_catalog` in SHARE ROW EXCLUSIVE mode, so
+      concurrent insert triggers wait for the rebuild instead of being lost or
+      counted twice, while readers keep seeing the old rows until commit
+
+  3. New Triggers
+    - `city_catalog_places_update` on `places` (AFTER UPDATE, per statement)
+    - `city_catalog_places_delete` on `places` (AFTER DELETE, per statement)
+
+  4. Security
+    - `refresh_city_catalog_cities` is not callable by `anon` or `authenticated`
+*/
+
+CREATE OR REPLACE FUNCTION refresh_city_catalog_cities(cities text[])
+RETURNS void AS $$
+BEGIN
+  LOCK TABLE city_catalog IN SHARE ROW EXCLUSIVE MODE;
+  DELETE FROM city_catalog WHERE city = ANY(cities);
+  PERFORM apply_city_catalog_delta(city_catalog_deltas(
+    ARRAY(SELECT p FROM places p WHERE p.city = ANY(cities))
+  ));
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION refresh_city_catalog()
+RETURNS void AS $$
+BEGIN
+  LOCK TABLE city_catalog IN SHARE ROW EXCLUSIVE MODE;
+  DELETE FROM city_catalog WHERE true;
+  PERFORM apply_city_catalog_delta(city_catalog_deltas(ARRAY(SELECT p FROM places p)));
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION city_catalog_after_places_update()
+RETURNS trigger AS $$
+DECLARE
+  affected text[];
+BEGIN
+  -- Only rows whose catalogued columns changed; photo or similar_places
+  -- updates leave the catalog alone
+  SELECT ARRAY(
+    SELECT DISTINCT c.city
+    FROM old_rows o
+    JOIN new_rows n ON n.id = o.id
+    CROSS JOIN LATERAL (VALUES (o.city), (n.city)) AS c(city)
+    WHERE c.city IS NOT NULL
+      AND (
+        o.city IS DISTINCT FROM n.city
+        OR o.category IS DISTINCT FROM n.category
+        OR o.umbrella_category IS DISTINCT FROM n.umbrella_category
+        OR o.mood_tags IS DISTINCT FROM n.mood_tags
+        OR o.coordinates::geometry IS DISTINCT FROM n.coordinates::geometry
+      )
+  ) INTO affected;
+
+  IF cardinality(affected) > 0 THEN
+    PERFORM refresh_city_catalog_cities(affected);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION city_catalog_after_places_delete()
+RETURNS trigger AS $$
+DECLARE
+  affected text[];
+BEGIN
+  SELECT ARRAY(
+    SELECT DISTINCT city FROM old_rows WHERE city IS NOT NULL
+  ) INTO affected;
+
+  IF cardinality(affected) > 0 THEN
+    PERFORM refresh_city_catalog_cities(affected);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS city_catalog_places_update ON places;
+
+CREATE TRIGGER city_catalog_places_update
+  AFTER UPDATE ON places
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION city_catalog_after_places_update();
+
+DROP TRIGGER IF EXISTS city_catalog_places_delete ON places;
+
+CREATE TRIGGER city_catalog_places_delete
+  AFTER DELETE ON places
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION city_catalog_after_places_delete();
+
+REVOKE EXECUTE ON FUNCTION refresh_city_catalog_cities(text[]) FROM PUBLIC, anon, authenticated;